@@ -0,0 +1,812 @@
+#Module with benchmarks of the data pipeline of the app, run on synthetic
+#data so that no download is needed.
+
+#Usage:
+#    python covid19bench.py [benchmark [--option value ...]]
+#
+#Without a benchmark all of them are run with their default options.
+#Options are the parameters of the benchmark function, e.g.
+#    python covid19bench.py hit_test --n-regions 500
+#    python covid19bench.py data_modes --url mysql+mysqlconnector://...
+#and are listed by python covid19bench.py <benchmark> --help. Without a
+#database url the benchmarks use a temporary SQLite file as a stand-in for
+#MySQL.
+
+#Part of Project: COVID19 Statstics\Visualisation
+
+import os
+import time
+import argparse
+import inspect
+import tempfile
+import tracemalloc
+import json
+import pandas as pd
+import numpy as np
+from sqlalchemy import create_engine
+
+import covid19data
+
+def make_global_data(n_countries=200, n_days=1000, seed=0):
+    #Synthetic DataFrame with the same columns and dtypes as 'global' table
+    rng = np.random.default_rng(seed)
+    n = n_countries * n_days
+
+    new_cases = rng.integers(0, 10000, n)
+    new_deaths = new_cases // 50
+    new_tests = new_cases * 10
+
+    def cumsum(values):
+        return values.reshape(n_countries, n_days).cumsum(axis=1).ravel()
+
+    df = pd.DataFrame({
+        'iso_code': np.repeat([f'C{i:03d}' for i in range(n_countries)], n_days),
+        'continent': np.repeat(['Asia', 'Europe', 'Africa', 'Oceania'], -(-n // 4))[:n],
+        'country': np.repeat([f'Country {i}' for i in range(n_countries)], n_days),
+        'date': np.tile(pd.date_range('2020-01-01', periods=n_days).values, n_countries),
+        'total_cases': cumsum(new_cases),
+        'new_cases': new_cases,
+        'total_deaths': cumsum(new_deaths),
+        'new_deaths': new_deaths,
+        'new_tests': new_tests,
+        'total_tests': cumsum(new_tests),
+        'tests_per_case': rng.random(n) * 20,
+        'positive_rate': rng.random(n),
+        'population': np.repeat(rng.integers(10**5, 10**9, n_countries), n_days),
+        'population_density': np.repeat(rng.random(n_countries) * 500, n_days),
+        })
+    return df.astype({'iso_code': 'string', 'continent': 'string', 'country': 'string'})
+
+def report(name, seconds, rows):
+    print(f'{name:<30} {seconds:>8.3f} s {rows/seconds:>12,.0f} rows/s')
+
+def bench_bulk_load(url=None, n_countries=100, n_days=1000):
+    '''
+    Compare rows per second of the bulk insert modes of covid19data against
+    the previous to_sql(chunksize=500) path.
+    '''
+    df = make_global_data(n_countries, n_days)
+    print(f'Bulk load of {len(df):,} rows')
+
+    tmp_dir = None
+    if url is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp_dir.name, 'bench.db')}"
+
+    modes = ['to_sql', 'executemany']
+    connect_args = {}
+    if url.startswith('mysql'):
+        modes.append('infile')
+        connect_args = {'allow_local_infile': True}
+
+    engine = create_engine(url, connect_args=connect_args)
+
+    for mode in modes:
+        start = time.perf_counter()
+        with engine.begin() as connection:
+            covid19data.insert_rows(df, 'bench_global', connection,
+                                    if_exists='replace', mode=mode)
+        report(mode, time.perf_counter() - start, len(df))
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE bench_global')
+    engine.dispose()
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+def make_states_daily(n_states=38, n_days=600, seed=0):
+    #Synthetic states_daily records, one per date and status with string
+    #counts for each state code, like api.covid19india.org json
+    rng = np.random.default_rng(seed)
+    codes = [f's{i:02d}' for i in range(n_states - 1)] + ['tt']
+    records = []
+    for date in pd.date_range('2020-03-14', periods=n_days):
+        for status in covid19data.india_daily_status:
+            counts = rng.integers(0, 5000, n_states)
+            record = {code: str(count) for code, count in zip(codes, counts)}
+            record.update(date=date.strftime('%d-%b-%y'),
+                          dateymd=date.strftime('%Y-%m-%d'), status=status)
+            records.append(record)
+    state_dict = {code: f'State {code}' for code in codes}
+    state_dict['tt'] = 'Total'
+    return records, state_dict
+
+def reshape_states_daily_pivot(records, state_dict):
+    #Previous melt + pivot_table reshaping of covid19data, kept for comparison
+    india_df = pd.DataFrame(records)
+    india_df.drop(columns='dateymd', inplace=True)
+    india_df = india_df.melt(id_vars=['date','status'])
+    india_df = pd.pivot_table(india_df, values='value',
+                              index=['date','variable'],
+                              columns=['status'], aggfunc='sum')
+    india_df.reset_index(inplace=True)
+    india_df['date'] = pd.to_datetime(india_df['date'], format='%d-%b-%y')
+    india_df.sort_values(by=['variable', 'date'], inplace=True)
+    india_df.columns.name = None
+    india_df.reset_index(drop=True, inplace=True)
+    india_df.rename(columns={'variable':'state',
+                             'Confirmed':'confirmed',
+                             'Deceased':'deceased',
+                             'Recovered':'recovered'},
+                    inplace=True)
+    india_df = india_df.astype(dtype={'state':'string',
+                                      'confirmed':'int64',
+                                      'deceased':'int64',
+                                      'recovered':'int64'})
+    india_df['state'] = india_df['state'].replace(to_replace=state_dict)
+    india_df['total_confirmed'] = india_df.groupby('state')['confirmed'].transform(pd.Series.cumsum)
+    india_df['total_deceased'] = india_df.groupby('state')['deceased'].transform(pd.Series.cumsum)
+    return india_df
+
+def bench_global_stream(n_countries=100, n_days=1000, chunksizes='0,10000,100000'):
+    '''
+    Compare time and peak memory of streaming a global csv file into the
+    database with several chunk sizes, 0 reads the whole file at once.
+    '''
+    df = make_global_data(n_countries, n_days)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'covid19_global_data.csv')
+        df.rename(columns={'country': 'location'}).to_csv(path, index=False)
+        print(f'Load of {os.path.getsize(path)/2**20:.1f} MB global csv, {len(df):,} rows')
+
+        engine = covid19data.sqlite_engine(os.path.join(tmp_dir, 'bench.db'))
+        for chunksize in [int(n) or None for n in str(chunksizes).split(',')]:
+            start = time.perf_counter()
+            rows = covid19data.write_global_data(path, [engine], chunksize)
+            report(f'chunksize {chunksize}', time.perf_counter() - start, rows)
+
+            covid19data.write_global_data(path, [engine], chunksize, trace_memory=True)
+            peak = covid19data.etl_report['global']['peak_memory']
+            print(f'{"":<30} {peak/2**20:>8.1f} MB peak')
+        engine.dispose()
+
+def bench_states_daily(n_states=38, n_days=600):
+    '''
+    Compare time and peak memory of the vectorized states_daily reshaper
+    against the previous melt + pivot_table path.
+    '''
+    records, state_dict = make_states_daily(n_states, n_days)
+    print(f'Reshape of {len(records):,} states_daily records')
+
+    results = {}
+    for name, reshape in [('melt + pivot_table', reshape_states_daily_pivot),
+                          ('reshape_states_daily', covid19data.reshape_states_daily)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        results[name] = df = reshape(records, state_dict)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report(name, seconds, len(df))
+        print(f'{"":<30} {peak/2**20:>8.1f} MB peak')
+
+    old, new = results.values()
+    pd.testing.assert_frame_equal(old, new, check_dtype=False)
+
+def bench_json_decode(n_states=38, n_days=600):
+    '''
+    Compare parse time and peak memory of the json decoders of covid19data
+    on a states_daily file, followed by the reshape to india_daily rows.
+    '''
+    records, state_dict = make_states_daily(n_states, n_days)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'states_daily.json')
+        with open(path, mode='w') as fp:
+            json.dump({'states_daily': records}, fp)
+        print(f'Decode of {os.path.getsize(path)/2**20:.1f} MB states_daily.json')
+
+        frames = []
+        for name in covid19data.json_decoders:
+            try:
+                start = time.perf_counter()
+                obj = covid19data.load_json(path, name)
+            except ImportError:
+                continue
+            frames.append(covid19data.reshape_states_daily(obj['states_daily'], state_dict))
+            seconds = time.perf_counter() - start
+
+            covid19data.load_json(path, name, trace_memory=True)
+            stats = covid19data.etl_report['json']['states_daily.json']
+            print(f'{name:<30} {stats["seconds"]:>8.3f} s parse '
+                  f'{seconds:>8.3f} s total '
+                  f'{stats["peak_memory"]/2**20:>8.1f} MB peak')
+
+    for df in frames[1:]:
+        pd.testing.assert_frame_equal(frames[0], df)
+
+def bench_data_modes(url=None, n_countries=100, years='5,20', n_queries=50):
+    '''
+    Compare startup time and memory of the app's preload data mode (whole
+    global table read into a LocationIndex) with the pushdown mode
+    (LocationQuery), and the time of range queries in both, on synthetic
+    global tables of several years of history.
+    '''
+    rng = np.random.default_rng(0)
+
+    tmp_dir = None
+    if not url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        engine = covid19data.sqlite_engine(os.path.join(tmp_dir.name, 'bench.db'))
+    else:
+        engine = create_engine(url)
+
+    def preload():
+        df = pd.read_sql('global', con=engine, index_col='ID', parse_dates=['date'])
+        return covid19data.LocationIndex(covid19data.compact_global_data(df), 'country')
+
+    def pushdown():
+        return covid19data.LocationQuery(engine, 'global', 'country')
+
+    columns = ['date', 'total_cases', 'new_cases', 'new_deaths', 'total_deaths']
+
+    for n_years in [int(n) for n in str(years).split(',')]:
+        df = make_global_data(n_countries, n_years*365)
+        covid19data.write_table(df, 'global', [engine])
+        print(f'{n_years} years, {len(df):,} rows')
+
+        countries = rng.choice(df['country'].unique(), n_queries)
+        starts = rng.integers(0, n_years*365 - 90, n_queries)
+        ranges = [(pd.Timestamp('2020-01-01') + pd.Timedelta(days=int(start)),
+                   pd.Timestamp('2020-01-01') + pd.Timedelta(days=int(start) + 90))
+                  for start in starts]
+
+        for name, load in [('preload', preload), ('pushdown', pushdown)]:
+            start = time.perf_counter()
+            index = load()
+            startup = time.perf_counter() - start
+
+            tracemalloc.start()
+            load()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            for country, (from_date, to_date) in zip(countries, ranges):
+                index.select(country, from_date, to_date, columns)
+            first = (time.perf_counter() - start) / n_queries
+
+            start = time.perf_counter()
+            for country, (from_date, to_date) in zip(countries, ranges):
+                index.select(country, from_date, to_date, columns)
+            repeat = (time.perf_counter() - start) / n_queries
+
+            print(f'{name:<12} startup {startup:>7.3f} s {peak/2**20:>8.2f} MB peak  '
+                  f'query {first*1000:>7.2f} ms  repeated {repeat*1000:>7.2f} ms')
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql('DROP TABLE global')
+    engine.dispose()
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+graph_columns = ['total_cases', 'new_cases', 'new_deaths', 'total_deaths']
+
+def make_graph_selections(n_selections, n_countries, n_days, seed=0):
+    #Per country frames of synthetic global data and a random sequence of
+    #selected countries with repeats
+    df = make_global_data(n_countries, n_days)
+    frames = {country: frame for country, frame in df.groupby('country')}
+    rng = np.random.default_rng(seed)
+    return frames, rng.choice(list(frames), n_selections)
+
+def plot_graph_seaborn(canvas, country, frame):
+    #Previous country graph path of the app: axes re-created and four
+    #seaborn line plots with fill on every selection
+    import seaborn as sns
+    from matplotlib.gridspec import GridSpec
+
+    figure = canvas.figure
+    figure.clear()
+    gridSpec = GridSpec(2, 2, hspace=0.3, wspace=0.3)
+    axesList = [figure.add_subplot(gridSpec[i, j]) for i, j in [(0, 0), (0, 1), (1, 1), (1, 0)]]
+    for axes, yattr in zip(axesList, graph_columns):
+        sns.lineplot(data=frame, x='date', y=yattr, ax=axes)
+        axes.fill_between(frame['date'].values, frame[yattr].values, alpha=0.3)
+    figure.suptitle(f'{country} Line Graph\nCase - Time Series', fontsize=16, linespacing=1.5)
+    canvas.draw()
+    return axesList
+
+def bench_line_panels(n_selections=40, n_countries=12, n_days=600):
+    '''
+    Compare redraw time per selection of the country graph plotted with
+    seaborn lineplot against covid19plot.TimeSeriesPanels, whose artists are
+    created once and only get new data, on an Agg canvas.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import covid19plot
+
+    frames, selections = make_graph_selections(n_selections, n_countries, n_days)
+    print(f'{len(selections)} selections of {len(frames)} countries, {n_days} days each')
+
+    canvas = FigureCanvasAgg(Figure(figsize=(10, 8)))
+    start = time.perf_counter()
+    for country in selections:
+        plot_graph_seaborn(canvas, country, frames[country])
+    seconds = time.perf_counter() - start
+    print(f'{"seaborn lineplot":<30} {seconds/len(selections)*1000:>8.1f} ms per selection')
+
+    figure = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(figure)
+    gridSpec = GridSpec(2, 2, hspace=0.3, wspace=0.3)
+    panels = covid19plot.TimeSeriesPanels(
+        [figure.add_subplot(gridSpec[i, j]) for i, j in [(0, 0), (0, 1), (1, 1), (1, 0)]],
+        ['C0', 'C0', 'C3', 'C3'])
+
+    update = draw = 0
+    for country in selections:
+        frame = frames[country]
+        start = time.perf_counter()
+        panels.update(frame['date'].values, [frame[yattr].values for yattr in graph_columns])
+        figure.suptitle(f'{country} Line Graph\nCase - Time Series', fontsize=16, linespacing=1.5)
+        update += time.perf_counter() - start
+        canvas.draw()
+        draw += time.perf_counter() - start
+    print(f'{"TimeSeriesPanels":<30} {draw/len(selections)*1000:>8.1f} ms per selection '
+          f'({update/len(selections)*1000:.2f} ms update)')
+
+def bench_render_cache(n_selections=60, n_countries=12, n_days=600, budget_mb=64):
+    '''
+    Compare time per selection of plotting country graphs like the app
+    (four seaborn line plots with fill) on every selection, against showing
+    them through covid19plot.RenderCache, on an Agg canvas and a random
+    sequence of selections with repeats.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import covid19plot
+
+    frames, selections = make_graph_selections(n_selections, n_countries, n_days)
+    n_selections = len(selections)
+    print(f'{n_selections} selections of {len(frames)} countries, {n_days} days each')
+
+    canvas = FigureCanvasAgg(Figure(figsize=(10, 8)))
+
+    def plot(country):
+        return plot_graph_seaborn(canvas, country, frames[country])
+
+    start = time.perf_counter()
+    for country in selections:
+        plot(country)
+    seconds = time.perf_counter() - start
+    print(f'{"plot every selection":<30} {seconds/n_selections*1000:>8.1f} ms per selection')
+
+    cache = covid19plot.RenderCache(budget_mb * 2**20)
+    start = time.perf_counter()
+    for country in selections:
+        if covid19plot.restore_render(cache, country, canvas) is None:
+            plot(country)
+            covid19plot.save_render(cache, country, canvas)
+    seconds = time.perf_counter() - start
+    print(f'{"render cache":<30} {seconds/n_selections*1000:>8.1f} ms per selection')
+
+    stats = cache.stats()
+    print(f'{"":<30} hit ratio {stats["hit_ratio"]:.2f}, {stats["evictions"]} evictions, '
+          f'{stats["entries"]} entries, {stats["bytes"]/2**20:.1f} MB')
+
+def make_regions(n_regions=250, n_vertices=200, seed=0):
+    #Synthetic map: a grid of disjoint star shaped polygons, every 10th with
+    #a hole and every 7th a MultiPolygon with an island, named like countries
+    from shapely.geometry import Polygon, MultiPolygon
+
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n_regions)))
+    angles = np.linspace(0, 2*np.pi, n_vertices, endpoint=False)
+    geometries = []
+    for i in range(n_regions):
+        x, y = (i % side) * 10 - 180, (i // side) * 7 - 60
+        radius = 2 + rng.random(n_vertices)
+        ring = np.column_stack([radius*np.cos(angles), radius*np.sin(angles)])
+        polygon = Polygon(ring + [x, y], [ring[::4]*0.2 + [x, y]] if i % 10 == 0 else None)
+        if i % 7 == 0:
+            polygon = MultiPolygon([polygon, Polygon(ring*0.2 + [x+4, y+2.5])])
+        geometries.append(polygon)
+    return [f'Country {i}' for i in range(n_regions)], geometries
+
+def bench_choropleth(n_regions=250, n_vertices=200, n_switches=20):
+    '''
+    Compare time per metric switch of a choropleth rebuilt geometry by
+    geometry (figure cleared, one patch and a DataFrame lookup per region, as
+    the app did with add_geometries) against covid19plot.ChoroplethMap,
+    which only updates colours and the norm, on an Agg canvas.
+    '''
+    import matplotlib as mpl
+    from matplotlib.figure import Figure
+    from matplotlib.patches import PathPatch
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import covid19plot
+
+    names, geometries = make_regions(n_regions, n_vertices)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'country': names,
+                       'total_cases': rng.integers(0, 10**7, len(names)),
+                       'total_deaths': rng.integers(0, 10**5, len(names))})
+    metrics = [('total_cases', mpl.cm.Blues), ('total_deaths', mpl.cm.Reds)]
+    print(f'{n_switches} metric switches of a map of {len(names)} regions')
+
+    figure = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(figure)
+    start = time.perf_counter()
+    for i in range(n_switches):
+        column, cmap = metrics[i % 2]
+        figure.clear()
+        axes = figure.add_subplot(111)
+        maxCases = df[column].max()
+        for name, geometry in zip(names, geometries):
+            cases = df.loc[df.country == name, column].values[0]
+            axes.add_patch(PathPatch(covid19plot.geometry_path(geometry),
+                                     facecolor=cmap(cases/maxCases, 1), edgecolor='k', linewidth=0.2))
+        axes.autoscale_view()
+        figure.colorbar(mpl.cm.ScalarMappable(mpl.colors.Normalize(df[column].min(), maxCases), cmap), ax=axes)
+        canvas.draw()
+    seconds = time.perf_counter() - start
+    print(f'{"rebuild per switch":<30} {seconds/n_switches*1000:>8.1f} ms per switch')
+
+    figure = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    start = time.perf_counter()
+    choropleth = covid19plot.ChoroplethMap(axes, names, geometries)
+    choropleth.set_locations(df['country'].values)
+    axes.set_xlim(-185, 185)
+    axes.set_ylim(-65, 100)
+    figure.colorbar(choropleth.collection, ax=axes)
+    print(f'{"ChoroplethMap build":<30} {(time.perf_counter() - start)*1000:>8.1f} ms')
+
+    update = draw = 0
+    for i in range(n_switches):
+        column, cmap = metrics[i % 2]
+        start = time.perf_counter()
+        choropleth.set_values(df[column].values, cmap)
+        update += time.perf_counter() - start
+        canvas.draw()
+        draw += time.perf_counter() - start
+    print(f'{"ChoroplethMap.set_values":<30} {draw/n_switches*1000:>8.1f} ms per switch '
+          f'({update/n_switches*1000:.2f} ms update)')
+
+def bench_hit_test(n_regions=250, n_vertices=200, n_events=2000):
+    '''
+    Compare latency per mouse move of finding the region under the cursor
+    by an exact test against every region (like GeoDataFrame.contains)
+    with covid19plot.HitTester, on a random walk of the cursor over a
+    synthetic map.
+    '''
+    import shapely
+    import covid19plot
+
+    names, geometries = make_regions(n_regions, n_vertices)
+    rng = np.random.default_rng(0)
+    path = np.cumsum(rng.normal(0, 0.5, (n_events, 2)), axis=0) + [-100, 0]
+    print(f'{n_events} mouse moves over a map of {len(names)} regions')
+
+    geometry_array = np.asarray(geometries, dtype=object)
+    start = time.perf_counter()
+    expected = []
+    for x, y in path:
+        inside = shapely.contains_xy(geometry_array, x, y)
+        expected.append(names[inside.argmax()] if inside.any() else None)
+    seconds = time.perf_counter() - start
+    print(f'{"exact test of every region":<30} {seconds/n_events*1e6:>8.1f} us per event')
+
+    latencies = []
+    tester = covid19plot.HitTester('bench', names, geometries,
+                                   hook=lambda name, seconds, candidates, cached: latencies.append(seconds))
+    found = [tester.hit(x, y) for x, y in path]
+    assert found == expected
+    report = covid19plot.hover_report['bench']
+    print(f'{"HitTester":<30} {np.mean(latencies)*1e6:>8.1f} us per event '
+          f'(p99 {np.percentile(latencies, 99)*1e6:.1f} us, '
+          f'{report["cached"]/report["events"]:.0%} from last hit)')
+
+def bench_hover(n_events=200, n_days=600):
+    '''
+    Compare time per mouse move over the country graph when the hover
+    handler redraws the whole figure (draw_idle) against
+    covid19plot.HoverAnnotator, which blits the annotation on a cached
+    background, on an Agg canvas. Events are fed directly, so there is no
+    coalescing by the frame timer here.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.gridspec import GridSpec
+    from matplotlib.backend_bases import MouseEvent
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import covid19plot
+
+    frames, selections = make_graph_selections(1, 1, n_days)
+    frame = frames[selections[0]]
+    print(f'{n_events} mouse moves over the country graph, {n_days} days')
+
+    def make_graph():
+        figure = Figure(figsize=(10, 8))
+        canvas = FigureCanvasAgg(figure)
+        gridSpec = GridSpec(2, 2, hspace=0.3, wspace=0.3)
+        panels = covid19plot.TimeSeriesPanels(
+            [figure.add_subplot(gridSpec[i, j]) for i, j in [(0, 0), (0, 1), (1, 1), (1, 0)]],
+            ['C0', 'C0', 'C3', 'C3'])
+        panels.update(frame['date'].values, [frame[yattr].values for yattr in graph_columns])
+        annotations = {axes: axes.annotate('', xy=(0, 0), xytext=(-20, 10), textcoords='offset points',
+                                           bbox=dict(boxstyle='round', fc='w'), visible=False)
+                       for axes in panels.axes_list}
+        canvas.draw()
+
+        def on_move(event):
+            changed = False
+            for axes, annotation in annotations.items():
+                contain = axes is event.inaxes and axes.get_lines()[0].contains(event)[0]
+                if contain:
+                    annotation.xy = (event.xdata, event.ydata)
+                    annotation.set_text(f'{event.ydata:,.0f}')
+                changed |= contain or annotation.get_visible()
+                annotation.set_visible(contain)
+            return changed
+
+        #Cursor moving along the line of the first panel
+        axes = panels.axes_list[0]
+        x, y = panels.lines[0].get_data()
+        points = axes.transData.transform(np.column_stack([x, y]))
+        events = [MouseEvent('motion_notify_event', canvas, *points[i])
+                  for i in np.linspace(0, len(x) - 1, n_events).astype(int)]
+        return canvas, annotations, on_move, events
+
+    canvas, annotations, on_move, events = make_graph()
+    start = time.perf_counter()
+    for event in events:
+        if on_move(event):
+            canvas.draw_idle()
+    seconds = time.perf_counter() - start
+    print(f'{"draw_idle per move":<30} {seconds/n_events*1000:>8.2f} ms per event')
+
+    canvas, annotations, on_move, events = make_graph()
+    hover = covid19plot.HoverAnnotator(canvas, annotations.values(), on_move, interval=0)
+    canvas.draw()
+    start = time.perf_counter()
+    for event in events:
+        canvas.callbacks.process('motion_notify_event', event)
+    seconds = time.perf_counter() - start
+    print(f'{"HoverAnnotator blit":<30} {seconds/n_events*1000:>8.2f} ms per event')
+
+def bench_hover_lookup(lengths='600,5000,20000', n_events=500):
+    '''
+    Compare time per mouse move of finding the hovered sample of a time
+    series panel with Line2D.contains and num2date (the app's previous
+    hover) against TimeSeriesPanels.nearest and label, for series of
+    growing length, and how often the two agree on a hit.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.dates import num2date
+    from matplotlib.backend_bases import MouseEvent
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import covid19plot
+
+    rng = np.random.default_rng(0)
+    for n_days in [int(n) for n in str(lengths).split(',')]:
+        figure = Figure(figsize=(10, 8))
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        panels = covid19plot.TimeSeriesPanels([axes], ['C0'])
+        dates = pd.date_range('2020-01-01', periods=n_days).values
+        panels.update(dates, [rng.integers(0, 10000, n_days)])
+        canvas.draw()
+
+        #Cursor at random places on and around the line
+        x, y = panels.lines[0].get_data()
+        samples = rng.integers(0, n_days, n_events)
+        points = axes.transData.transform(np.column_stack([x[samples], y[samples]]))
+        points += rng.normal(0, 6, points.shape)
+        events = [MouseEvent('motion_notify_event', canvas, *point) for point in points]
+
+        start = time.perf_counter()
+        old = []
+        for event in events:
+            contain, ind = panels.lines[0].contains(event)
+            if contain:
+                date = num2date(x[ind['ind'][0]]).strftime('%d-%b-%y')
+                old.append(f'{int(y[ind["ind"][0]]):n} | {date}')
+            else:
+                old.append(None)
+        contains = (time.perf_counter() - start) / n_events
+
+        start = time.perf_counter()
+        panels.label(axes, 0)
+        labels = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = []
+        for event in events:
+            ind = panels.nearest(axes, event.x, event.y)
+            new.append(None if ind is None else panels.label(axes, ind))
+        nearest = (time.perf_counter() - start) / n_events
+
+        agree = np.mean([(a is None) == (b is None) for a, b in zip(old, new)])
+        print(f'{n_days:>6} days  Line2D.contains {contains*1e6:>8.1f} us  '
+              f'nearest {nearest*1e6:>8.1f} us per event  (hits agree {agree:.0%}, '
+              f'labels formatted in {labels*1000:.1f} ms)')
+
+def bench_geometry_cache(n_regions=250, n_vertices=2000, n_draws=5):
+    '''
+    Time of writing and loading a covid19geo geometry cache of a synthetic
+    map, and draw time of the map at every simplification level, with the
+    level covid19geo would pick for the canvas marked.
+    '''
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import covid19geo
+    import covid19plot
+
+    names, geometries = make_regions(n_regions, n_vertices)
+    print(f'Map of {len(names)} regions, {n_vertices} vertices each')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        covid19geo.write_geometry_cache(tmp_dir, names, geometries)
+        print(f'{"write cache":<30} {time.perf_counter() - start:>8.3f} s')
+
+        start = time.perf_counter()
+        cache = covid19geo.GeometryCache(tmp_dir)
+        paths = cache.paths()
+        print(f'{"load cache, level 0 paths":<30} {time.perf_counter() - start:>8.3f} s')
+
+        figure = Figure(figsize=(10, 8))
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        choropleth = covid19plot.ChoroplethMap(axes, cache.names, paths)
+        choropleth.set_locations(names)
+        choropleth.set_values(np.arange(len(names)))
+        axes.set_xlim(-185, 185)
+        axes.set_ylim(-65, 100)
+        canvas.draw()
+
+        chosen = cache.level_for(370 / axes.get_window_extent().width)
+        for level, tolerance in enumerate(cache.tolerances):
+            choropleth.set_paths(cache.paths(level))
+            start = time.perf_counter()
+            for i in range(n_draws):
+                canvas.draw()
+            seconds = (time.perf_counter() - start) / n_draws
+            vertices = len(cache.arrays(level)['coords'])
+            print(f'level {level} ({tolerance:g} deg){" *" if level == chosen else "":<10} '
+                  f'{seconds*1000:>8.1f} ms per draw {vertices:>10,} vertices')
+
+def derive_metrics_groupby(df, table):
+    #Derived metrics of covid19data.derived_metrics with pandas groupby
+    #rolling and shift per location, for comparison
+    spec = covid19data.derived_metrics[table]
+    window = covid19data.rolling_window
+    groups = df.groupby('country', sort=False, observed=True)
+    columns = {}
+    for col in spec['rolling']:
+        columns[f'{col}_weekly_avg'] = (groups[col].rolling(window, min_periods=1).mean()
+                                        .reset_index(level=0, drop=True).sort_index())
+    population = df[spec['population']].astype('float64').where(df[spec['population']] > 0)
+    for col in spec['per_million']:
+        columns[f'{col}_per_million'] = df[col] / population * 10**6
+    cases = df[spec['cases']].astype('float64')
+    columns['case_fatality_rate'] = df[spec['deaths']] / cases.where(cases > 0) * 100
+    average = columns[f"{spec['daily_cases']}_weekly_avg"]
+    previous = average.groupby(df['country'], observed=True).shift(window)
+    columns['growth_rate'] = (average - previous) / previous.where(previous > 0) * 100
+    return pd.DataFrame(columns)
+
+def bench_derived_metrics(n_countries=200, n_days=1000):
+    '''
+    Compare the time of computing derived metrics (rolling means, per
+    million rates, case fatality and growth rates) of the global table with
+    covid19data.derive_metrics, one pass over the contiguous rows of the
+    locations, against pandas groupby rolling and shift.
+    '''
+    df = make_global_data(n_countries, n_days)
+    index = covid19data.LocationIndex(covid19data.compact_global_data(df), 'country')
+    sorted_df = index.dataFrame.reset_index(drop=True)
+    print(f'{len(sorted_df):,} rows of {n_countries} countries')
+
+    start = time.perf_counter()
+    expected = derive_metrics_groupby(sorted_df, 'global')
+    report('pandas groupby', time.perf_counter() - start, len(sorted_df))
+
+    start = time.perf_counter()
+    columns = covid19data.derive_metrics(sorted_df, 'global', index.starts)
+    report('derive_metrics', time.perf_counter() - start, len(sorted_df))
+
+    for name in covid19data.derived_columns('global'):
+        np.testing.assert_allclose(columns[name], expected[name].to_numpy(dtype='float64'),
+                                   rtol=1e-5, equal_nan=True)
+
+def bench_report(n_countries=40, n_days=600, workers='1,2', formats='png'):
+    '''
+    Time of rendering the reports of covid19report (line and correlation
+    graphs of every country and state) from a feather snapshot of synthetic
+    tables with pools of several numbers of processes. Files rendered by
+    every pool must be identical.
+    '''
+    from datetime import datetime
+    import covid19report
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    directory = tmp_dir.name + os.sep
+    engine = covid19data.sqlite_engine(os.path.join(tmp_dir.name, 'bench.db'))
+
+    records, state_dict = make_states_daily(38, n_days)
+    india_daily = covid19data.reshape_states_daily(records, state_dict)
+    states = sorted(set(state_dict.values()))
+    india_total = pd.DataFrame({'statecode': list(state_dict), 'state': list(state_dict.values()),
+                                'confirmed': 1000, 'active': 100, 'recovered': 800, 'deaths': 100,
+                                'population': 10**7, 'density': 300,
+                                'lastupdatedtime': pd.Timestamp('2021-01-01')})
+    covid19data.write_table(make_global_data(n_countries, n_days), 'global', [engine])
+    covid19data.write_table(india_daily, 'india_daily', [engine])
+    covid19data.write_table(india_total, 'india_total', [engine])
+    covid19data.write_snapshot(engine, directory, datetime.now())
+    engine.dispose()
+    print(f'{n_countries} countries and {len(states) - 1} states, {n_days} days each')
+
+    outputs = {}
+    for n_workers in [int(n) for n in str(workers).split(',')]:
+        output_dir = os.path.join(tmp_dir.name, f'reports{n_workers}')
+        result = covid19report.render_reports(directory, output_dir, formats.split(','), n_workers)
+        print(f'{n_workers} workers {result["seconds"]:>8.2f} s for {result["files"]} files '
+              f'{result["seconds"]/result["locations"]*1000:>8.1f} ms per location '
+              f'({result["render_seconds"]/result["locations"]*1000:.1f} ms rendering)')
+
+        outputs[n_workers] = {}
+        for root, dirs, files in os.walk(output_dir):
+            for file in files:
+                with open(os.path.join(root, file), 'rb') as fp:
+                    outputs[n_workers][os.path.relpath(os.path.join(root, file), output_dir)] = fp.read()
+
+    first = next(iter(outputs.values()))
+    assert all(output == first for output in outputs.values())
+
+    tmp_dir.cleanup()
+
+benchmarks = {
+    'bulk_load': bench_bulk_load,
+    'global_stream': bench_global_stream,
+    'states_daily': bench_states_daily,
+    'json_decode': bench_json_decode,
+    'data_modes': bench_data_modes,
+    'line_panels': bench_line_panels,
+    'render_cache': bench_render_cache,
+    'choropleth': bench_choropleth,
+    'hit_test': bench_hit_test,
+    'hover': bench_hover,
+    'hover_lookup': bench_hover_lookup,
+    'geometry_cache': bench_geometry_cache,
+    'report': bench_report,
+    'derived_metrics': bench_derived_metrics,
+    }
+
+def parse_args(argv=None):
+    #Benchmark name and its options, a subcommand per benchmark with an
+    #option per parameter, typed like its default (lists like '5,20' and
+    #the url are strings)
+    parser = argparse.ArgumentParser(usage='%(prog)s [-h] [benchmark [--option value ...]]',
+                                     description='Benchmarks of the data pipeline of the app '
+                                                 'on synthetic data.')
+    subparsers = parser.add_subparsers(dest='benchmark', metavar='benchmark', prog=parser.prog,
+                                       help='one of %(choices)s, all of them if omitted')
+    for name, function in benchmarks.items():
+        subparser = subparsers.add_parser(name, description=inspect.cleandoc(function.__doc__))
+        for parameter in inspect.signature(function).parameters.values():
+            default = parameter.default
+            subparser.add_argument('--' + parameter.name.replace('_', '-'), dest=parameter.name,
+                                   type=str if default is None else type(default),
+                                   default=default, help=f'default: {default}')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+
+    args = vars(parse_args())
+    name = args.pop('benchmark')
+
+    if name is None:
+        for function in benchmarks.values():
+            function()
+            print()
+    else:
+        benchmarks[name](**args)
+        print()
@@ -0,0 +1,226 @@
+#Module to prepare map geometries of the app's choropleths once: shape files
+#are read, names are normalised to the names used in the data and polygons
+#are simplified to several levels, which are written to a cache of numpy
+#arrays that loads without geopandas (optionally memory mapped).
+
+#This module(when executed) prepares the caches of all map sources
+
+#Part of Project: COVID19 Statstics\Visualisation
+
+import os
+import sys
+import time
+import numpy as np
+from matplotlib.path import Path
+
+geo_config = {
+    'cache_dir': os.environ.get('COVID19_GEO_CACHE', '.\\data\\geo\\'),
+    'mmap': os.environ.get('COVID19_GEO_MMAP', '1') == '1',
+    #Simplification tolerances of the levels, in degrees. Level 0 keeps the
+    #geometries as they are
+    'tolerances': (0.0, 0.01, 0.05, 0.2),
+    }
+
+#Map sources of the app, with names in the shape files replaced by the
+#names used in the data
+geo_sources = {
+    'india': {
+        'path': r'F:\PYTHON\covid19_v2\project\app-resources\india_states.geojson',
+        'name_column': 'ST_NM',
+        'names': {'Andaman & Nicobar': 'Andaman and Nicobar Islands',
+                  'Jammu & Kashmir': 'Jammu and Kashmir'},
+        },
+    'world': {
+        'path': r'F:\PYTHON\covid19_v2\project\app-resources\world-shape-files\ne_110m_admin_0_countries.shp',
+        'name_column': 'NAME_LONG',
+        'names': {'Democratic Republic of the Congo': 'Democratic Republic of Congo',
+                  'Timor-Leste': 'Timor',
+                  "Côte d'Ivoire": "Cote d'Ivoire",
+                  'Republic of the Congo': 'Congo',
+                  'eSwatini': 'Eswatini',
+                  'The Gambia': 'Gambia',
+                  'Lao PDR': 'Laos',
+                  'Republic of Korea': 'South Korea',
+                  'Brunei Darussalam': 'Brunei',
+                  'Czech Republic': 'Czechia',
+                  'Somaliland': 'Somalia',
+                  'Macedonia': 'North Macedonia',
+                  'Russian Federation': 'Russia'},
+        },
+    }
+
+def read_geometries(path, name_column, names=None):
+    '''
+    Names and geometries (in longitude/latitude, the coordinates of the
+    PlateCarree maps of the app) of a shape file or GeoJSON, with names
+    replaced by names.
+    '''
+    import geopandas as gpd
+
+    gdf = gpd.read_file(path)
+    if gdf.crs is not None:
+        gdf = gdf.to_crs('EPSG:4326')
+    location_names = gdf[name_column]
+    if names:
+        location_names = location_names.replace(names)
+    return location_names.to_numpy(dtype=str), gdf.geometry.values
+
+def flatten_geometries(geometries):
+    '''
+    Arrays of the polygons of geometries: coords of all rings (exteriors
+    counter-clockwise, holes clockwise), offsets of rings into coords, of
+    polygons into rings and of geometries into polygons.
+    '''
+    from shapely.geometry.polygon import orient
+
+    coords, rings, parts, offsets = [], [0], [0], [0]
+    for geometry in geometries:
+        polygons = [] if geometry is None or geometry.is_empty else getattr(geometry, 'geoms', [geometry])
+        for polygon in polygons:
+            if polygon.is_empty:
+                continue
+            polygon = orient(polygon)
+            for ring in [polygon.exterior, *polygon.interiors]:
+                ring_coords = np.asarray(ring.coords)[:, :2]
+                coords.append(ring_coords)
+                rings.append(rings[-1] + len(ring_coords))
+            parts.append(len(rings) - 1)
+        offsets.append(len(parts) - 1)
+
+    return {'coords': np.concatenate(coords) if coords else np.zeros((0, 2)),
+            'rings': np.array(rings, dtype=np.int64),
+            'parts': np.array(parts, dtype=np.int64),
+            'geometries': np.array(offsets, dtype=np.int64)}
+
+def write_geometry_cache(cache_dir, names, geometries, tolerances=None):
+    '''
+    Write names and geometries simplified to every tolerance (in degrees,
+    topology preserving) to cache_dir as .npy files.
+    '''
+    import shapely
+
+    tolerances = geo_config['tolerances'] if tolerances is None else tolerances
+    os.makedirs(cache_dir, exist_ok=True)
+
+    for level, tolerance in enumerate(tolerances):
+        simplified = geometries
+        if tolerance:
+            simplified = shapely.simplify(np.asarray(geometries, dtype=object), tolerance,
+                                          preserve_topology=True)
+        for key, array in flatten_geometries(simplified).items():
+            np.save(os.path.join(cache_dir, f'{key}_{level}.npy'), array)
+
+    np.save(os.path.join(cache_dir, 'tolerances.npy'), np.asarray(tolerances, dtype=float))
+    #Written last, marks the cache as complete
+    np.save(os.path.join(cache_dir, 'names.npy'), np.asarray(names, dtype=str))
+
+def prepare_geometry_cache(name, cache_dir=None, tolerances=None):
+    #Read map source name of geo_sources and write its cache
+    source = geo_sources[name]
+    cache_dir = os.path.join(geo_config['cache_dir'] if cache_dir is None else cache_dir, name)
+    names, geometries = read_geometries(source['path'], source['name_column'], source['names'])
+    write_geometry_cache(cache_dir, names, geometries, tolerances)
+    return cache_dir
+
+def geometry_cache_is_stale(name, cache_dir=None):
+    #Whether the cache of map source name is missing or older than its source
+    cache_dir = os.path.join(geo_config['cache_dir'] if cache_dir is None else cache_dir, name)
+    try:
+        created = os.path.getmtime(os.path.join(cache_dir, 'names.npy'))
+    except OSError:
+        return True
+    try:
+        return os.path.getmtime(geo_sources[name]['path']) > created
+    except OSError:
+        return False
+
+class GeometryCache:
+    '''
+    Geometries of a cache written by write_geometry_cache. Arrays are memory
+    mapped if mmap. paths(level) gives the matplotlib Paths of the
+    geometries for drawing and shapes(level) shapely geometries for hit
+    testing, both built once per level.
+    '''
+    def __init__(self, cache_dir, mmap=None):
+        self.cache_dir = cache_dir
+        self.mmap_mode = 'r' if (geo_config['mmap'] if mmap is None else mmap) else None
+        self.names = np.load(os.path.join(cache_dir, 'names.npy'))
+        self.tolerances = np.load(os.path.join(cache_dir, 'tolerances.npy'))
+        self.levels = {}
+        self.level_paths = {}
+        self.level_shapes = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def arrays(self, level):
+        if level not in self.levels:
+            self.levels[level] = {key: np.load(os.path.join(self.cache_dir, f'{key}_{level}.npy'),
+                                               mmap_mode=self.mmap_mode)
+                                  for key in ['coords', 'rings', 'parts', 'geometries']}
+        return self.levels[level]
+
+    def level_for(self, degrees_per_pixel):
+        #Most simplified level whose tolerance is below the size of a pixel
+        fine = np.flatnonzero(self.tolerances <= degrees_per_pixel)
+        return int(fine[np.argmax(self.tolerances[fine])]) if len(fine) else 0
+
+    def paths(self, level=0):
+        if level not in self.level_paths:
+            arrays = self.arrays(level)
+            coords, rings = np.asarray(arrays['coords']), arrays['rings']
+            parts, offsets = arrays['parts'], arrays['geometries']
+
+            codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+            codes[rings[:-1]] = Path.MOVETO
+            codes[rings[1:] - 1] = Path.CLOSEPOLY
+
+            paths = []
+            for first, last in zip(offsets[:-1], offsets[1:]):
+                start, stop = rings[parts[first]], rings[parts[last]]
+                paths.append(Path(coords[start:stop], codes[start:stop]))
+            self.level_paths[level] = paths
+        return self.level_paths[level]
+
+    def shapes(self, level=0):
+        if level not in self.level_shapes:
+            from shapely.geometry import Polygon, MultiPolygon
+
+            arrays = self.arrays(level)
+            coords, rings = np.asarray(arrays['coords']), arrays['rings']
+            parts, offsets = arrays['parts'], arrays['geometries']
+
+            def polygon(part):
+                ring_coords = [coords[rings[ring]:rings[ring+1]]
+                               for ring in range(parts[part], parts[part+1])]
+                return Polygon(ring_coords[0], ring_coords[1:])
+
+            shapes = []
+            for first, last in zip(offsets[:-1], offsets[1:]):
+                polygons = [polygon(part) for part in range(first, last)]
+                if len(polygons) == 1:
+                    shapes.append(polygons[0])
+                else:
+                    shapes.append(MultiPolygon(polygons) if polygons else Polygon())
+            self.level_shapes[level] = shapes
+        return self.level_shapes[level]
+
+def load_geometry_cache(name, cache_dir=None, mmap=None):
+    '''
+    GeometryCache of map source name of geo_sources, prepared first if it
+    is missing or older than the source.
+    '''
+    if geometry_cache_is_stale(name, cache_dir):
+        prepare_geometry_cache(name, cache_dir)
+    cache_dir = os.path.join(geo_config['cache_dir'] if cache_dir is None else cache_dir, name)
+    return GeometryCache(cache_dir, mmap)
+
+if __name__ == '__main__':
+
+    for name in sys.argv[1:] or list(geo_sources):
+        start = time.perf_counter()
+        cache_dir = prepare_geometry_cache(name)
+        cache = GeometryCache(cache_dir)
+        vertices = [len(cache.arrays(level)['coords']) for level in range(len(cache.tolerances))]
+        print(f'{name}: {len(cache)} geometries in {time.perf_counter() - start:.2f} s, '
+              f'vertices per level {vertices}')
@@ -0,0 +1,582 @@
+#Module with plotting helpers of the app: time series panels and choropleth
+#maps whose artists are created once and only get new data on later
+#selections, hover annotations drawn by blitting, and a cache of rendered
+#figures so that a recently shown selection is not drawn again. Graphs of a
+#location (graph_layouts) are built here for both the app and covid19report.
+
+#Part of Project: COVID19 Statstics\Visualisation
+
+import os
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import matplotlib
+from matplotlib.collections import PolyCollection, PathCollection
+from matplotlib.colors import Normalize
+from matplotlib.dates import date2num, DateFormatter, MonthLocator
+from matplotlib.gridspec import GridSpec
+from matplotlib.path import Path
+from matplotlib.ticker import FuncFormatter
+
+#Memory budget of the render cache, can be overridden with an environment
+#variable (in MB)
+render_config = {
+    'cache_budget': int(os.environ.get('COVID19_RENDER_CACHE_MB', 256)) * 2**20,
+    }
+
+#Statistics of hover hit-testing, by name of the hit tester
+hover_report = {}
+
+#A rendered figure: the strings of its texts (suptitle), the rendered pixels
+#as an Agg BufferRegion, the size of the figure in pixels and the memory
+#used by the pixels
+RenderEntry = namedtuple('RenderEntry', ['texts', 'region', 'size', 'nbytes'])
+
+class RenderCache:
+    '''
+    LRU cache of rendered figures, keyed by anything identifying what is
+    plotted, e.g. (kind, location, from date, to date, data version). Least
+    recently used entries are evicted once the entries use more than
+    max_bytes. Safe to use from several threads.
+    '''
+    def __init__(self, max_bytes=None):
+        self.max_bytes = render_config['cache_budget'] if max_bytes is None else max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key).nbytes
+            if entry.nbytes > self.max_bytes:
+                return
+            self.entries[key] = entry
+            self.nbytes += entry.nbytes
+            while self.nbytes > self.max_bytes:
+                key, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self.entries),
+                    'bytes': self.nbytes,
+                    'max_bytes': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions}
+
+class TimeSeriesPanels:
+    '''
+    One line with a filled area below it on each of axes_list, for daily
+    series sharing one date axis. The Line2D and PolyCollection artists are
+    created once, update() only sets their data and the limits and locators
+    of the axes (seaborn lineplot grouped, aggregated and re-created all of
+    them on every selection). For hover, nearest() finds the sample under
+    the mouse by binary search on the dates and label() gives its text,
+    formatted with label_format once per selection.
+    '''
+    def __init__(self, axes_list, colors, margin=0.05,
+                 label_format='{value:n} | {date}', date_format='%d-%b-%y'):
+        self.axes_list = axes_list
+        self.margin = margin
+        self.label_format = label_format
+        self.date_format = date_format
+        self.lines = []
+        self.fills = []
+        self.x = np.zeros(0)
+        self.dates = None
+        self.date_labels = None
+        self.series_list = []
+        self.labels = []
+        for axes, color in zip(axes_list, colors):
+            line, = axes.plot([], [], color=color)
+            fill = PolyCollection([], color=color, alpha=0.3)
+            axes.add_collection(fill, autolim=False)
+            axes.xaxis_date()
+            self.lines.append(line)
+            self.fills.append(fill)
+
+    def update(self, dates, series_list, locator=None):
+        '''
+        Show series_list (one array per axes) against dates (datetime64
+        array), the lines are cleared if dates is empty. locator, if given,
+        becomes the major locator of the x axes.
+        '''
+        x = date2num(dates)
+        self.x = x
+        self.dates = dates
+        self.date_labels = None
+        #Limits are computed in float64, differences of compact int8/int16
+        #columns would overflow
+        self.series_list = [np.asarray(y, dtype='float64') for y in series_list]
+        self.labels = [None] * len(self.series_list)
+
+        if len(x) == 0:
+            for line, fill in zip(self.lines, self.fills):
+                line.set_data([], [])
+                fill.set_verts([])
+            return
+
+        xpad = (x[-1] - x[0]) * self.margin or 1
+        #Outline of the filled area: down to the baseline at both ends
+        xfill = np.r_[x[0], x, x[-1]]
+
+        for axes, line, fill, y in zip(self.axes_list, self.lines, self.fills, self.series_list):
+            line.set_data(x, y)
+            fill.set_verts([np.column_stack([xfill, np.r_[0, y, 0]])])
+
+            ymin = min(0, y.min())
+            ymax = y.max()
+            ypad = (ymax - ymin) * self.margin or 1
+            axes.set_xlim(x[0] - xpad, x[-1] + xpad)
+            axes.set_ylim(ymin - ypad, ymax + ypad)
+
+            if locator is not None:
+                axes.xaxis.set_major_locator(locator)
+
+    def nearest(self, axes, x, y, radius=5):
+        '''
+        Index of the sample of the line on axes nearest in date to display
+        point (x, y) (like event.x, event.y), or None if the line is farther
+        than radius points from it (the pick radius of Line2D). Samples
+        within the radius left and right are found by binary search, so the
+        cost does not grow with the length of the series.
+        '''
+        panel = self.axes_list.index(axes)
+        series = self.series_list[panel]
+        if len(self.x) == 0:
+            return None
+
+        radius = radius * axes.get_figure().dpi / 72
+        transform = axes.transData
+        (left, _), (right, _) = transform.inverted().transform([(x - radius, y), (x + radius, y)])
+        start = max(np.searchsorted(self.x, left) - 1, 0)
+        stop = min(np.searchsorted(self.x, right) + 1, len(self.x))
+        points = transform.transform(np.column_stack([self.x[start:stop], series[start:stop]]))
+
+        #Distance of (x, y) to segments between the samples in the window
+        point = np.array([x, y])
+        if len(points) == 1:
+            distance = np.hypot(*(points[0] - point))
+        else:
+            a, b = points[:-1], points[1:]
+            ab = b - a
+            length = (ab**2).sum(axis=1)
+            t = np.clip(((point - a) * ab).sum(axis=1) / np.where(length, length, 1), 0, 1)
+            distance = np.hypot(*(a + t[:, None]*ab - point).T).min()
+        if distance > radius:
+            return None
+
+        return start + np.abs(points[:, 0] - x).argmin()
+
+    def label(self, axes, index):
+        #Text of sample index of the line on axes
+        panel = self.axes_list.index(axes)
+        if self.labels[panel] is None:
+            if self.date_labels is None:
+                self.date_labels = pd.DatetimeIndex(self.dates).strftime(self.date_format)
+            self.labels[panel] = [self.label_format.format(value=int(value), date=date)
+                                  for value, date in zip(self.series_list[panel], self.date_labels)]
+        return self.labels[panel][index]
+
+#Graphs of a location. 'line' graphs have a panel per column on a 2x2 grid
+#(cells in order of columns), 'cr' (correlation) graphs have totals on the
+#top row and daily values on the bottom one, deaths on twin axes. colors are
+#indices into the palette of plot_theme
+graph_layouts = {
+    'country': {'type': 'line',
+                'columns': ['total_cases', 'new_cases', 'new_deaths', 'total_deaths'],
+                'labels': ['Total Cases', 'Daily New Cases', 'Daily New Deaths', 'Total Deaths'],
+                'colors': [0, 0, 3, 3],
+                'cells': [(0, 0), (0, 1), (1, 1), (1, 0)],
+                'title': '{location} Line Graph\nCase - Time Series'},
+    'state': {'type': 'line',
+              'columns': ['total_confirmed', 'confirmed', 'deceased', 'recovered'],
+              'labels': ['Total Cases', 'Daily New Cases', 'Daily New Deaths', 'Daily New Recoveries'],
+              'colors': [0, 0, 3, 2],
+              'cells': [(0, 0), (0, 1), (1, 0), (1, 1)],
+              'title': '{location} Line Graph\nCase - Time Series'},
+    'country_cr': {'type': 'cr',
+                   'columns': ['total_cases', 'total_deaths', 'new_cases', 'new_deaths'],
+                   'labels': ['Total Cases', 'Total Deaths', 'Daily New Cases', 'Daily New Deaths'],
+                   'colors': [0, 3, 0, 3],
+                   'title': '{location} Correlation Line Graph\nCase - Time Series'},
+    'state_cr': {'type': 'cr',
+                 'columns': ['total_confirmed', 'total_deceased', 'confirmed', 'deceased'],
+                 'labels': ['Total Cases', 'Total Deaths', 'Daily New cases', 'Daily New Deaths'],
+                 'colors': [0, 3, 0, 3],
+                 'title': '{location} Correlation Line Graph\nCase - Time Series'},
+    }
+
+_palette = None
+_theme_lock = threading.Lock()
+
+def plot_theme(font_path=None):
+    '''
+    Colour palette of the graphs. Seaborn's theme, and the font of
+    font_path if given, are applied to matplotlib on first call, which must
+    come before the first graph is created.
+    '''
+    global _palette
+    with _theme_lock:
+        if _palette is None:
+            import seaborn as sns
+            from matplotlib import font_manager
+
+            sns.set()
+            if font_path:
+                font_manager.fontManager.addfont(font_path)
+                matplotlib.rcParams['font.family'] = font_manager.FontProperties(fname=font_path).get_name()
+            _palette = sns.color_palette()
+    return _palette
+
+def count_formatter():
+    #Tick labels of counts, grouped by the current locale
+    return FuncFormatter(lambda x, pos: f'{int(x):n}')
+
+def date_locator(dates):
+    #Ticks every 3, 2 or 1 months for dates spanning at least 15, 8 or less
+    #months
+    months = (dates.max() - dates.min()) // np.timedelta64(1, 'D') / 30
+    return MonthLocator(interval=3 if months >= 15 else 2 if months >= 8 else 1)
+
+def count_ticks(max_values, n=5):
+    '''
+    n ticks from 0 to every value of max_values rounded up to a multiple of
+    its highest power of ten (34567 -> 40000), as an array of shape
+    (len(max_values), n).
+    '''
+    max_values = np.asarray(max_values, dtype='float64')
+    powers = 10 ** np.floor(np.log10(np.maximum(max_values, 10)))
+    tops = np.where(max_values < 10, np.ceil(max_values), np.ceil(max_values / powers) * powers)
+    return tops[:, None] * np.linspace(0, 1, n)
+
+def location_graph(figure, kind, palette, date_formatter=None, y_formatter=None):
+    '''
+    TimeSeriesPanels of graph kind of graph_layouts on figure, panels of
+    line graphs are labelled 'Axes1' to 'Axes4'. Artists are created once,
+    update_graph shows the data of a location on them.
+    '''
+    layout = graph_layouts[kind]
+    date_formatter = date_formatter or DateFormatter('%b, %y')
+    y_formatter = y_formatter or count_formatter()
+
+    if layout['type'] == 'line':
+        grid = GridSpec(2, 2, hspace=0.3, wspace=0.3)
+        axes_list = [figure.add_subplot(grid[cell], label=f'Axes{i+1}')
+                     for i, cell in enumerate(layout['cells'])]
+    else:
+        grid = GridSpec(2, 1, hspace=0.1)
+        top, bottom = figure.add_subplot(grid[0, 0]), figure.add_subplot(grid[1, 0])
+        axes_list = [top, top.twinx(), bottom, bottom.twinx()]
+
+    panels = TimeSeriesPanels(axes_list, [palette[i] for i in layout['colors']])
+
+    for axes, ylabel in zip(axes_list, layout['labels']):
+        axes.xaxis.set_major_formatter(date_formatter)
+        axes.yaxis.set_major_formatter(y_formatter)
+        if layout['type'] == 'line':
+            axes.set_ylabel(ylabel, fontsize=12.5)
+            axes.set_xlabel('Date', fontsize=12.5)
+        else:
+            axes.set_ylabel(ylabel, fontsize=13)
+            axes.tick_params(axis='both', which='both', length=0, pad=8, labelsize=12)
+
+    if layout['type'] == 'cr':
+        top, top_twin, bottom, bottom_twin = axes_list
+        top.set_xlabel('')
+        bottom.set_xlabel('Date', fontsize=13)
+        top_twin.grid(False)
+        bottom_twin.grid(False)
+        top.tick_params(axis='x', labelbottom=False)
+
+        for axes in axes_list:
+            position = axes.get_position()
+            position.x0 += 0.1
+            position.x1 -= 0.1
+            axes.set_position(position)
+
+    return panels
+
+def update_graph(panels, kind, location, df):
+    '''
+    Show the columns of graph kind of df (rows of location sorted by 'date')
+    on panels made by location_graph, titled with location.
+    '''
+    layout = graph_layouts[kind]
+    dates = df['date'].values
+    series_list = [df[column].values for column in layout['columns']]
+
+    if len(dates) == 0:
+        #No rows in the selected dates, the panels are cleared
+        panels.update(dates, series_list)
+    elif layout['type'] == 'line':
+        panels.update(dates, series_list, date_locator(dates))
+    else:
+        panels.update(dates, series_list)
+        for axes, ticks in zip(panels.axes_list, count_ticks([y.max() for y in series_list])):
+            axes.set_yticks(ticks)
+
+    panels.axes_list[0].get_figure().suptitle(layout['title'].format(location=location),
+                                              fontsize=16, linespacing=1.5)
+
+def geometry_path(geometry):
+    '''
+    Matplotlib Path of a shapely Polygon or MultiPolygon, exteriors
+    counter-clockwise and holes clockwise so that holes are not filled.
+    '''
+    from shapely.geometry.polygon import orient
+
+    polygons = getattr(geometry, 'geoms', [geometry])
+    rings = []
+    for polygon in polygons:
+        polygon = orient(polygon)
+        for ring in [polygon.exterior, *polygon.interiors]:
+            vertices = np.asarray(ring.coords)[:, :2]
+            codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+            codes[0] = Path.MOVETO
+            codes[-1] = Path.CLOSEPOLY
+            rings.append(Path(vertices, codes))
+    return Path.make_compound_path(*rings)
+
+class ChoroplethMap:
+    '''
+    Choropleth of geometries (shapely polygons or matplotlib Paths, in data
+    coordinates of axes) named by names, drawn as a single collection. Rows
+    of the values of each geometry are looked up once per set of locations
+    (set_locations), so showing another metric (set_values) only updates
+    the colour array, the colormap and the limits of the norm, which a
+    colorbar of the collection follows.
+    '''
+    def __init__(self, axes, names, geometries, edgecolor='k', linewidth=0.2):
+        self.names = np.asarray(names, dtype=object)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        self.norm = Normalize(0, 1, clip=True)
+        self.collection = PathCollection([geometry if isinstance(geometry, Path) else geometry_path(geometry)
+                                          for geometry in geometries],
+                                         edgecolor=edgecolor, linewidth=linewidth,
+                                         norm=self.norm, transform=axes.transData)
+        axes.add_collection(self.collection, autolim=False)
+        self.rows = np.full(len(self.names), -1)
+        self.values = np.zeros(len(self.names))
+
+    def set_paths(self, paths):
+        #Replace the outlines of the geometries (same order), e.g. by another
+        #simplification level
+        self.collection.set_paths(paths)
+
+    def set_locations(self, locations):
+        #Rows of locations (a sequence of names) of each geometry, -1 if none
+        rows = {location: row for row, location in enumerate(locations)}
+        self.rows = np.array([rows.get(name, -1) for name in self.names])
+
+    def set_values(self, values, cmap=None, vmin=None, vmax=None):
+        '''
+        Colour the geometries by values, aligned with the locations given to
+        set_locations. Geometries without a location get 0. vmin and vmax
+        default to the range of values.
+        '''
+        values = np.asarray(values)
+        self.values = np.where(self.rows >= 0, values[self.rows], 0)
+
+        self.collection.set_array(self.values)
+        if cmap is not None:
+            self.collection.set_cmap(cmap)
+        #Limits are set on the norm in place, a new norm would reset locator
+        #and formatter of the colorbar
+        self.collection.set_clim(values.min() if vmin is None else vmin,
+                                 values.max() if vmax is None else vmax)
+
+    def value(self, name):
+        #Value shown for the geometry named name, 0 if there is no such one
+        position = self.positions.get(name)
+        return 0 if position is None else self.values[position]
+
+class HitTester:
+    '''
+    Finds the geometry under the mouse. Candidates are filtered by their
+    bounding boxes with an STRtree and only those are tested exactly, all
+    at once against the prepared geometries; while the point stays inside
+    the last hit geometry even that test is the only one done. Latency of every test is added up in hover_report[name] and,
+    if given, passed to hook(name, seconds, candidates, cached).
+    '''
+    def __init__(self, name, names, geometries, hook=None):
+        import shapely
+        from shapely.strtree import STRtree
+
+        self.name = name
+        self.names = np.asarray(names, dtype=object)
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.hook = hook
+        self.last = None
+        self.report = hover_report[name] = {'events': 0, 'cached': 0,
+                                            'seconds': 0.0, 'max_seconds': 0.0}
+
+    def hit(self, x, y):
+        #Name of the geometry containing point (x, y), None if there is none
+        import shapely
+
+        start = time.perf_counter()
+        cached = self.last is not None and shapely.contains_xy(self.geometries[self.last], x, y)
+        candidates = 0
+        if not cached:
+            self.last = None
+            indices = np.sort(self.tree.query(shapely.Point(x, y)))
+            candidates = len(indices)
+            hits = indices[shapely.contains_xy(self.geometries.take(indices), x, y)]
+            if len(hits):
+                self.last = hits[0]
+        seconds = time.perf_counter() - start
+
+        self.report['events'] += 1
+        self.report['cached'] += bool(cached)
+        self.report['seconds'] += seconds
+        self.report['max_seconds'] = max(self.report['max_seconds'], seconds)
+        if self.hook is not None:
+            self.hook(self.name, seconds, candidates, bool(cached))
+
+        return None if self.last is None else self.names[self.last]
+
+class HoverAnnotator:
+    '''
+    Hover annotations of a canvas drawn by blitting. The annotations are
+    animated, so full draws leave them out; after every full draw (resize,
+    new data) the background is copied and later changes of annotations
+    only restore it and draw them on top. Mouse moves are coalesced to one
+    call of on_move(event) per interval (ms, a display frame), with the
+    latest event. on_move updates the annotations and returns whether
+    anything changed; only then the canvas is blitted. For Qt canvases it
+    has to be created and captured in the GUI thread, which owns its timer
+    and is the only one painting the canvas.
+    '''
+    def __init__(self, canvas, annotations, on_move, interval=1000/60):
+        self.canvas = canvas
+        self.annotations = list(annotations)
+        self.on_move = on_move
+        self.background = None
+        self.event = None
+        self.pending = False
+        for annotation in self.annotations:
+            annotation.set_animated(True)
+
+        self.timer = None
+        if interval:
+            self.timer = canvas.new_timer(interval=int(interval))
+            self.timer.single_shot = True
+            self.timer.add_callback(self.flush)
+
+        self.cids = [canvas.mpl_connect('draw_event', self.on_draw),
+                     canvas.mpl_connect('motion_notify_event', self.on_motion)]
+
+    def disconnect(self):
+        for cid in self.cids:
+            self.canvas.mpl_disconnect(cid)
+        if self.timer is not None:
+            self.timer.stop()
+
+    def on_draw(self, event):
+        self.capture()
+
+    def capture(self):
+        #Copy the figure as background, called (in the GUI thread) after it
+        #was drawn or its pixels were restored (see restore_render)
+        figure = self.canvas.figure
+        self.background = self.canvas.copy_from_bbox(figure.bbox)
+        self.draw_annotations()
+
+    def on_motion(self, event):
+        self.event = event
+        if self.timer is None:
+            self.flush()
+        elif not self.pending:
+            self.pending = True
+            self.timer.start()
+
+    def flush(self):
+        self.pending = False
+        if self.event is not None and self.on_move(self.event):
+            self.blit()
+
+    def draw_annotations(self):
+        figure = self.canvas.figure
+        for annotation in self.annotations:
+            if annotation.get_visible():
+                figure.draw_artist(annotation)
+
+    def blit(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_annotations()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+def save_render(cache, key, canvas):
+    '''
+    Store the pixels of the figure of canvas, which has just been drawn, in
+    cache under key. The artists of the figure are reused (like those of
+    TimeSeriesPanels), they must be given the data of key back before
+    restore_render.
+    '''
+    figure = canvas.figure
+    region = canvas.copy_from_bbox(figure.bbox)
+    x0, y0, x1, y1 = region.get_extents()
+
+    entry = RenderEntry(texts=[(text, text.get_text()) for text in figure.texts],
+                        region=region,
+                        size=tuple(figure.bbox.size),
+                        nbytes=(x1-x0) * (y1-y0) * 4)
+    cache.put(key, entry)
+
+def restore_render(cache, key, canvas):
+    '''
+    Show the figure stored under key on canvas. The cached pixels are
+    blitted, so nothing is rendered again (unless the canvas was resized
+    since). Returns the cache entry, or None if key is not in cache.
+    Blitting repaints the canvas, so for Qt canvases this must be called in
+    the GUI thread.
+    '''
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    figure = canvas.figure
+    for text, string in entry.texts:
+        text.set_text(string)
+
+    if entry.size == tuple(figure.bbox.size):
+        canvas.restore_region(entry.region)
+        canvas.blit(figure.bbox)
+    else:
+        canvas.draw()
+    return entry
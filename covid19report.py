@@ -0,0 +1,174 @@
+#Module to render reports of the app's graphs without the GUI: line and
+#correlation graphs of every country and every Indian state are drawn on
+#Agg canvases (with the same code as the app, see covid19plot.graph_layouts)
+#by a pool of processes and saved as PNG, SVG and/or PDF files. The processes
+#read the tables from the memory mapped feather snapshot written by database
+#update, so the data is shared by all of them instead of copied to each one.
+
+#Usage:
+#    python covid19report.py [output directory] [formats, e.g. png,pdf]
+
+#Part of Project: COVID19 Statstics\Visualisation
+
+import sys
+import os
+import re
+import time
+import locale
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from covid19data import (LocationIndex, snapshot_version, read_snapshot_table,
+                         region_locations)
+from covid19plot import graph_layouts, plot_theme, location_graph, update_graph
+
+report_config = {
+    'data_dir': os.environ.get('COVID19_DATA_DIR', '.\\data\\'),
+    'output_dir': os.environ.get('COVID19_REPORT_DIR', '.\\reports\\'),
+    'formats': os.environ.get('COVID19_REPORT_FORMATS', 'png').split(','),
+    #Number of processes, all cores if 0
+    'workers': int(os.environ.get('COVID19_REPORT_WORKERS', 0)),
+    'locale': os.environ.get('COVID19_REPORT_LOCALE', 'English_India'),
+    'font': r'.\app-resources\Ubuntu-Regular.ttf',
+    'figsize': (12, 10),
+    'dpi': 100,
+    }
+
+#Tables of the snapshot with their location column, the graphs drawn for
+#every location and the locations which are not reported
+report_sources = {
+    'global': {'location_column': 'country',
+               'graphs': ['country', 'country_cr'],
+               'exclude': region_locations},
+    'india_daily': {'location_column': 'state',
+                    'graphs': ['state', 'state_cr'],
+                    'exclude': ['Total']},
+    }
+
+def report_tasks(directory, from_date=None, to_date=None):
+    '''
+    (table, location, rows) of every location of report_sources, rows are
+    the positions of its rows in the snapshot table between from_date and
+    to_date, sorted by date. Only the location and date columns are read.
+    '''
+    for table, source in report_sources.items():
+        location_column = source['location_column']
+        df = read_snapshot_table(table, directory, [location_column, 'date']).to_pandas()
+        index = LocationIndex(df, location_column)
+        positions = index.dataFrame.index.to_numpy()
+
+        for location in index.locations():
+            if location in source['exclude']:
+                continue
+            rows = positions[index.row_slice(location, from_date, to_date)]
+            if len(rows):
+                yield table, location, rows
+
+#State of a worker process: memory mapped snapshot tables and a figure with
+#the artists of every graph, created once and updated for every location
+_tables = {}
+_graphs = {}
+
+def init_worker(directory, locale_name=None, font_path=None):
+    #Map the snapshot tables and apply the theme of the app's graphs
+    if locale_name:
+        try:
+            locale.setlocale(locale.LC_ALL, locale_name)
+        except locale.Error:
+            pass
+    if font_path and not os.path.isfile(font_path):
+        font_path = None
+    plot_theme(font_path)
+
+    for table in report_sources:
+        _tables[table] = read_snapshot_table(table, directory)
+
+def location_file_name(location):
+    return re.sub(r'[^\w\-]+', '_', location).strip('_')
+
+def render_location(task, output_dir, formats):
+    '''
+    Draw the graphs of a task of report_tasks and save them to output_dir in
+    every format. Returns (paths of the files, seconds).
+    '''
+    start = time.perf_counter()
+    table, location, rows = task
+    graphs = report_sources[table]['graphs']
+
+    columns = ['date'] + sorted({column for kind in graphs
+                                 for column in graph_layouts[kind]['columns']})
+    df = _tables[table].take(rows).select(columns).to_pandas()
+
+    paths = []
+    for kind in graphs:
+        if kind not in _graphs:
+            figure = Figure(figsize=report_config['figsize'], dpi=report_config['dpi'])
+            FigureCanvasAgg(figure)
+            _graphs[kind] = location_graph(figure, kind, plot_theme())
+        panels = _graphs[kind]
+        update_graph(panels, kind, location, df)
+
+        figure = panels.axes_list[0].get_figure()
+        for file_format in formats:
+            path = os.path.join(output_dir, kind, f'{location_file_name(location)}.{file_format}')
+            figure.savefig(path, format=file_format)
+            paths.append(path)
+
+    return paths, time.perf_counter() - start
+
+def render_task(args):
+    return render_location(*args)
+
+def render_reports(directory=None, output_dir=None, formats=None, workers=None,
+                   from_date=None, to_date=None):
+    '''
+    Render the graphs of every location of report_sources with a pool of
+    workers processes (report_config is used for arguments left None).
+    Returns a dict with the number of locations, files and workers, the
+    wall clock seconds and the seconds spent in render_location, or None if
+    the feather snapshot is missing or stale.
+    '''
+    directory = directory or report_config['data_dir']
+    output_dir = output_dir or report_config['output_dir']
+    formats = formats or report_config['formats']
+    workers = workers or report_config['workers'] or os.cpu_count()
+
+    if snapshot_version(directory) is None:
+        return None
+
+    start = time.perf_counter()
+    tasks = list(report_tasks(directory, from_date, to_date))
+    for kinds in {tuple(source['graphs']) for source in report_sources.values()}:
+        for kind in kinds:
+            os.makedirs(os.path.join(output_dir, kind), exist_ok=True)
+
+    files = 0
+    render_seconds = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(directory, report_config['locale'], report_config['font'])) as executor:
+        #Several locations per message to the workers, a few chunks per
+        #worker so that they finish at about the same time
+        chunksize = max(1, len(tasks) // (workers * 4))
+        for paths, seconds in executor.map(render_task,
+                                           [(task, output_dir, formats) for task in tasks],
+                                           chunksize=chunksize):
+            files += len(paths)
+            render_seconds += seconds
+
+    return {'locations': len(tasks), 'files': files, 'workers': workers,
+            'seconds': time.perf_counter() - start, 'render_seconds': render_seconds}
+
+if __name__ == '__main__':
+
+    output_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    formats = sys.argv[2].split(',') if len(sys.argv) > 2 else None
+
+    result = render_reports(output_dir=output_dir, formats=formats)
+    if result is None:
+        print('Data snapshot is missing or stale, run covid19data.py or the app to update it.')
+        sys.exit(1)
+
+    print(f"{result['locations']} locations, {result['files']} files in {result['seconds']:.1f} s "
+          f"with {result['workers']} workers ({result['render_seconds']:.1f} s of rendering)")
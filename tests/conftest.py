@@ -0,0 +1,5 @@
+#The app's modules are scripts at the top of the repository, not a package
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,20 @@
+#Tests of the command line of covid19bench
+
+import pytest
+
+import covid19bench
+
+def test_parse_args_types():
+    args = covid19bench.parse_args(['bulk_load', '--url', 'sqlite://', '--n-days', '10'])
+    assert vars(args) == {'benchmark': 'bulk_load', 'url': 'sqlite://',
+                          'n_countries': 100, 'n_days': 10}
+
+    args = covid19bench.parse_args(['data_modes', '--years', '1,2'])
+    assert args.url is None and args.years == '1,2' and args.n_queries == 50
+
+def test_parse_args_all():
+    assert covid19bench.parse_args([]).benchmark is None
+
+def test_parse_args_invalid_int():
+    with pytest.raises(SystemExit):
+        covid19bench.parse_args(['hit_test', '--n-regions', 'many'])
@@ -0,0 +1,107 @@
+#Tests of the derived metrics of covid19data against pandas groupby
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import covid19data
+from covid19bench import make_global_data
+
+def groupby_metrics(df, table, location_column, population):
+    #Derived metrics with pandas groupby rolling and shift per location
+    spec = covid19data.derived_metrics[table]
+    window = covid19data.rolling_window
+    groups = df.groupby(location_column, sort=False, observed=True)
+    population = pd.Series(population, index=df.index, dtype='float64')
+    population = population.where(population > 0)
+
+    columns = {}
+    for col in spec['rolling']:
+        columns[f'{col}_weekly_avg'] = (groups[col].rolling(window, min_periods=1).mean()
+                                        .reset_index(level=0, drop=True).sort_index())
+    for col in spec['per_million']:
+        columns[f'{col}_per_million'] = df[col] / population * 10**6
+    cases = df[spec['cases']].astype('float64')
+    columns['case_fatality_rate'] = df[spec['deaths']] / cases.where(cases > 0) * 100
+    average = columns[f"{spec['daily_cases']}_weekly_avg"]
+    previous = average.groupby(df[location_column], observed=True).shift(window)
+    columns['growth_rate'] = (average - previous) / previous.where(previous > 0) * 100
+    return columns
+
+def assert_metrics_equal(columns, expected, table):
+    for name in covid19data.derived_columns(table):
+        assert columns[name].dtype == np.float32
+        np.testing.assert_allclose(columns[name], expected[name].to_numpy(dtype='float64'),
+                                   rtol=1e-5, equal_nan=True, err_msg=name)
+
+@pytest.fixture
+def global_df():
+    df = make_global_data(6, 40)
+    #Locations of different lengths, zero cases, population and a location
+    #shorter than the window
+    df = df.drop(index=df.index[(df['country'] == 'Country 1') & (df.index % 40 < 25)])
+    df = df.drop(index=df.index[(df['country'] == 'Country 2') & (df.index % 40 > 3)])
+    df.loc[df['country'] == 'Country 3', 'population'] = 0
+    df.loc[df.index % 40 < 10, ['new_cases', 'total_cases']] = 0
+    return df
+
+def test_derive_metrics_global(global_df):
+    index = covid19data.LocationIndex(global_df, 'country')
+    df = index.dataFrame.reset_index(drop=True)
+
+    columns = covid19data.derive_metrics(df, 'global', index.starts)
+    assert_metrics_equal(columns, groupby_metrics(df, 'global', 'country', df['population']), 'global')
+
+def test_derive_metrics_compact(global_df):
+    index = covid19data.LocationIndex(covid19data.compact_global_data(global_df), 'country')
+    df = index.dataFrame.reset_index(drop=True)
+
+    columns = covid19data.derive_metrics(df, 'global', index.starts)
+    assert_metrics_equal(columns, groupby_metrics(df, 'global', 'country', df['population']), 'global')
+
+def test_derive_metrics_population_per_row():
+    rng = np.random.default_rng(0)
+    n = 30
+    df = pd.DataFrame({'state': np.repeat(['A', 'B', 'C'], n),
+                       'date': np.tile(pd.date_range('2021-01-01', periods=n).values, 3),
+                       'confirmed': rng.integers(0, 100, 3*n),
+                       'deceased': rng.integers(0, 5, 3*n),
+                       'recovered': rng.integers(0, 90, 3*n)})
+    df['total_confirmed'] = df.groupby('state')['confirmed'].cumsum()
+    df['total_deceased'] = df.groupby('state')['deceased'].cumsum()
+    population = df['state'].map({'A': 10**6, 'B': 5*10**7, 'C': np.nan})
+
+    index = covid19data.LocationIndex(df, 'state')
+    columns = covid19data.derive_metrics(index.dataFrame, 'india_daily', index.starts, population)
+    assert_metrics_equal(columns, groupby_metrics(df, 'india_daily', 'state', population), 'india_daily')
+
+def test_pushdown_matches_preload(tmp_path, global_df):
+    #Derived columns of a date window computed per query from the rows of
+    #the window and the weeks before it are the ones of the whole table
+    engine = covid19data.sqlite_engine(os.path.join(tmp_path, 'test.db'))
+    covid19data.write_table(global_df, 'global', [engine])
+
+    index = covid19data.LocationIndex(global_df, 'country')
+    index.add_columns(covid19data.derive_metrics(index.dataFrame, 'global', index.starts))
+    query = covid19data.LocationQuery(engine, 'global', 'country')
+
+    columns = ['date'] + covid19data.derived_columns('global')
+    for country in index.locations():
+        pd.testing.assert_frame_equal(
+            query.select(country, '2020-01-20', '2020-02-05', columns),
+            index.select(country, '2020-01-20', '2020-02-05', columns).reset_index(drop=True),
+            check_dtype=False)
+    engine.dispose()
+
+def test_compact_dtypes_of_empty_table(tmp_path, global_df):
+    engine = covid19data.sqlite_engine(os.path.join(tmp_path, 'test.db'))
+    covid19data.write_table(global_df.head(0), 'global', [engine])
+    try:
+        dtypes = covid19data.query_compact_dtypes(engine)
+    finally:
+        engine.dispose()
+    assert dtypes == covid19data.compact_global_data(global_df.head(0)).dtypes[list(dtypes)].to_dict()
+    assert dtypes['total_cases'] == 'int8'
+    assert len(dtypes['country'].categories) == 0
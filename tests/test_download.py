@@ -0,0 +1,98 @@
+#Tests of the conditional downloads of covid19data against a local http server
+
+import os
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import covid19data
+
+body = b'date,location\n2020-01-01,India\n'
+etag = '"v1"'
+last_modified = 'Wed, 01 Jan 2020 00:00:00 GMT'
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append((self.path, dict(self.headers)))
+
+        if self.path == '/partial':
+            #Announce more bytes than are sent and drop the connection
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body) * 100))
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    Handler.requests = []
+    httpd = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path) + os.sep
+
+def test_download_and_not_modified(server, directory):
+    results, headers = covid19data.download_files(['a.csv'], [server + '/a.csv'], directory)
+    assert results == [('a.csv', 'Downloaded')]
+    assert headers['a.csv'] == {'etag': etag, 'last_modified': last_modified}
+    with open(directory + 'a.csv', 'rb') as fp:
+        assert fp.read() == body
+    assert 'If-None-Match' not in Handler.requests[-1][1]
+
+    covid19data.save_download_headers(directory, headers)
+    results, headers = covid19data.download_files(['a.csv'], [server + '/a.csv'], directory)
+    assert results == [('a.csv', 'Not modified')]
+    request_headers = Handler.requests[-1][1]
+    assert request_headers['If-None-Match'] == etag
+    assert request_headers['If-Modified-Since'] == last_modified
+
+def test_no_conditional_request_without_saved_headers(server, directory):
+    #A file left by an update which did not complete has no saved headers
+    with open(directory + 'a.csv', 'wb') as fp:
+        fp.write(b'stale')
+
+    results, headers = covid19data.download_files(['a.csv'], [server + '/a.csv'], directory)
+    assert results == [('a.csv', 'Downloaded')]
+    request_headers = Handler.requests[-1][1]
+    assert 'If-None-Match' not in request_headers
+    assert 'If-Modified-Since' not in request_headers
+    with open(directory + 'a.csv', 'rb') as fp:
+        assert fp.read() == body
+
+def test_partial_transfer_keeps_old_file(server, directory):
+    with open(directory + 'a.csv', 'wb') as fp:
+        fp.write(b'old')
+    with open(directory + 'a.csv.part', 'wb') as fp:
+        fp.write(b'left over')
+
+    results, headers = covid19data.download_files(['a.csv'], [server + '/partial'], directory)
+    assert results[0][1] not in ('Downloaded', 'Not modified')
+    with open(directory + 'a.csv', 'rb') as fp:
+        assert fp.read() == b'old'
+    assert not os.path.exists(directory + 'a.csv.part')
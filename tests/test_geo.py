@@ -0,0 +1,52 @@
+#Tests of the geometry cache of covid19geo
+
+import numpy as np
+import pytest
+
+shapely = pytest.importorskip('shapely')
+from shapely.geometry import Polygon
+
+import covid19geo
+import covid19plot
+from covid19bench import make_regions
+
+@pytest.fixture
+def regions():
+    names, geometries = make_regions(30, 40)
+    #A location without a geometry
+    return names + ['Nowhere'], geometries + [Polygon()]
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(tmp_path, regions, mmap):
+    names, geometries = regions
+    covid19geo.write_geometry_cache(str(tmp_path), names, geometries, (0.0, 0.5))
+    cache = covid19geo.GeometryCache(str(tmp_path), mmap)
+
+    assert list(cache.names) == names
+    assert len(cache) == len(names)
+    shapes = cache.shapes(0)
+    for geometry, shape in zip(geometries, shapes):
+        assert shape.equals(geometry) or (shape.is_empty and geometry.is_empty)
+    #MultiPolygons and holes survive
+    assert shapes[0].geom_type == 'MultiPolygon' and len(shapes[0].geoms[0].interiors) == 1
+    assert shapes[1].geom_type == 'Polygon'
+
+    #Paths are the ones drawn from the geometries directly
+    paths = cache.paths(0)
+    for geometry, path in zip(geometries[:-1], paths):
+        expected = covid19plot.geometry_path(geometry)
+        np.testing.assert_array_equal(path.vertices, expected.vertices)
+        np.testing.assert_array_equal(path.codes, expected.codes)
+    assert len(paths[-1].vertices) == 0
+
+    #Simplified level has fewer vertices, same geometries
+    assert len(cache.arrays(1)['coords']) < len(cache.arrays(0)['coords'])
+    assert len(cache.shapes(1)) == len(names)
+
+def test_level_for(tmp_path, regions):
+    names, geometries = regions
+    covid19geo.write_geometry_cache(str(tmp_path), names, geometries, (0.0, 0.01, 0.05, 0.2))
+    cache = covid19geo.GeometryCache(str(tmp_path))
+    assert cache.level_for(0.001) == 0
+    assert cache.level_for(0.03) == 1
+    assert cache.level_for(1) == 3
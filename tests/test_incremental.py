@@ -0,0 +1,101 @@
+#Tests of the incremental load of covid19data tables
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import covid19data
+from covid19bench import make_global_data
+
+def chunks(df, n):
+    size = -(-len(df) // n)
+    return [df.iloc[i:i+size] for i in range(0, len(df), size)]
+
+def load(df, engine, n_chunks=1):
+    covid19data.etl_report.clear()
+    for n, chunk in enumerate(chunks(df, n_chunks)):
+        covid19data.write_table(chunk, 'global', [engine], 'incremental',
+                                append=n > 0, swap=False)
+    covid19data.finish_table('global', [engine], 'incremental')
+    return covid19data.etl_report['global']['sqlite']
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = covid19data.sqlite_engine(os.path.join(tmp_path, 'test.db'))
+    yield engine
+    engine.dispose()
+
+def test_find_changed_rows():
+    old = make_global_data(3, 10)
+    keys = covid19data.column_kinds(old, ['country', 'date'])
+    kinds = covid19data.column_kinds(old, ['new_cases', 'positive_rate', 'continent'])
+    index = covid19data.key_index(old, keys)
+    hashes = covid19data.row_hashes(old, kinds)
+
+    new = old.iloc[::-1].reset_index(drop=True)
+    new.loc[0, 'new_cases'] += 1
+    #Last digit differences of float parsing are not changes
+    new.loc[1, 'positive_rate'] *= 1 + 1e-15
+    new.loc[2, 'date'] = pd.Timestamp('2030-01-01')
+
+    positions, changed, new_hashes = covid19data.find_changed_rows(new, index, hashes, keys, kinds)
+    assert positions[2] == -1
+    assert (positions[[0, 1, 3]] == [29, 28, 26]).all()
+    assert changed.tolist() == [True] + [False] * 29
+
+def test_find_changed_rows_of_database_values(engine):
+    #Values read back from SQLite (dates as text) match the loaded ones
+    df = make_global_data(3, 10)
+    load(df, engine)
+    old = pd.read_sql('SELECT * FROM global', engine)
+
+    keys = covid19data.column_kinds(df, ['country', 'date'])
+    kinds = covid19data.column_kinds(df, [col for col in df.columns if col not in keys])
+    positions, changed, hashes = covid19data.find_changed_rows(
+        df, covid19data.key_index(old, keys), covid19data.row_hashes(old, kinds), keys, kinds)
+    assert (positions == np.arange(len(df))).all()
+    assert not changed.any()
+
+@pytest.mark.parametrize('n_chunks', [1, 3])
+def test_incremental_load(engine, n_chunks):
+    df = make_global_data(5, 20)
+    assert load(df, engine, n_chunks) == {'inserted': 100, 'updated': 0, 'deleted': 0}
+    assert load(df, engine, n_chunks) == {'inserted': 0, 'updated': 0, 'deleted': 0}
+    ids = pd.read_sql('SELECT ID, country, date FROM global ORDER BY ID', engine, parse_dates=['date'])
+
+    new = df.drop(index=[20, 21]).copy()
+    new.loc[10, 'new_cases'] += 1
+    extra = new.iloc[[0]].assign(date=pd.Timestamp('2030-01-01'))
+    #The last of rows with the same keys is written
+    duplicate = new.iloc[[5]].assign(new_deaths=-1)
+    new = pd.concat([new, extra, duplicate], ignore_index=True)
+
+    assert load(new, engine, n_chunks) == {'inserted': 1, 'updated': 2, 'deleted': 2}
+
+    table = pd.read_sql('SELECT * FROM global', engine, index_col='ID', parse_dates=['date'])
+    assert len(table) == 99
+    assert table.index.is_unique
+    assert not table.duplicated(['country', 'date']).any()
+    assert table.loc[ids.ID[10], 'new_cases'] == df.loc[10, 'new_cases'] + 1
+    assert table.loc[ids.ID[5], 'new_deaths'] == -1
+    assert not ids.ID[[20, 21]].isin(table.index).any()
+
+def test_incremental_load_reads_stored_hashes(engine):
+    df = make_global_data(3, 10)
+    load(df, engine)
+    #A change made behind the load's back is not seen, the stored hashes
+    #are compared instead of the rows
+    with engine.begin() as connection:
+        connection.exec_driver_sql('UPDATE global SET new_cases = -1')
+    assert load(df, engine) == {'inserted': 0, 'updated': 0, 'deleted': 0}
+
+def test_incremental_load_adds_hash_column(engine):
+    df = make_global_data(3, 10)
+    load(df, engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f'ALTER TABLE global DROP COLUMN {covid19data.hash_column}')
+    #Rows of a table without hashes are rewritten once
+    assert load(df, engine) == {'inserted': 0, 'updated': 30, 'deleted': 0}
+    assert load(df, engine) == {'inserted': 0, 'updated': 0, 'deleted': 0}
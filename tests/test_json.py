@@ -0,0 +1,52 @@
+#Tests of the json decoders of covid19data
+
+import sys
+import json
+
+import pytest
+
+import covid19data
+
+data = {'states_daily': [{'date': '14-Mar-20', 'status': 'Confirmed', 'dl': '7', 'mh': ''}],
+        'statewise': [{'state': 'Delhi', 'confirmed': '7'}]}
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'states_daily.json'
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_load_json(path):
+    covid19data.etl_report.clear()
+    assert covid19data.load_json(path, 'json') == data
+
+    stats = covid19data.etl_report['json']['states_daily.json']
+    assert stats['decoder'] == 'json'
+    assert stats['bytes'] == len(json.dumps(data))
+    assert stats['peak_memory'] is None
+
+def test_load_json_trace_memory(path):
+    covid19data.load_json(path, 'json', trace_memory=True)
+    assert covid19data.etl_report['json']['states_daily.json']['peak_memory'] > 0
+
+def test_load_json_orjson(path):
+    pytest.importorskip('orjson')
+    assert covid19data.load_json(path, 'orjson') == data
+    assert covid19data.get_json_decoder('auto')[0] == 'orjson'
+
+def test_auto_decoder_without_orjson(path, monkeypatch):
+    #import of a module set to None in sys.modules raises ImportError
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    assert covid19data.get_json_decoder('auto')[0] == 'json'
+    assert covid19data.load_json(path) == data
+    assert covid19data.etl_report['json']['states_daily.json']['decoder'] == 'json'
+
+def test_json_columns():
+    records = [{'state': 'Delhi', 'confirmed': '7', 'deaths': '', 'notes': 'x'},
+               {'state': 'Goa', 'confirmed': '12'}]
+    df = covid19data.json_columns(records, {'state': 'string', 'confirmed': 'int64',
+                                            'deaths': 'int64'})
+    assert list(df.columns) == ['state', 'confirmed', 'deaths']
+    assert df.dtypes.astype(str).tolist() == ['string', 'int64', 'int64']
+    assert df['confirmed'].tolist() == [7, 12]
+    assert df['deaths'].tolist() == [0, 0]
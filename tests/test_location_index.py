@@ -0,0 +1,78 @@
+#Tests of the location indexes of covid19data, in memory and in database
+
+import os
+
+import pandas as pd
+import pytest
+
+import covid19data
+from covid19bench import make_global_data
+
+columns = ['date', 'total_cases', 'new_cases']
+
+@pytest.fixture
+def global_df():
+    df = make_global_data(4, 30)
+    #Rows of one day with a time of day, and rows out of order
+    df.loc[df['date'] == pd.Timestamp('2020-01-10'), 'date'] += pd.Timedelta(hours=18)
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+@pytest.fixture
+def engine(tmp_path, global_df):
+    engine = covid19data.sqlite_engine(os.path.join(tmp_path, 'test.db'))
+    covid19data.write_table(global_df, 'global', [engine])
+    yield engine
+    engine.dispose()
+
+def expected(df, location, from_date, to_date):
+    rows = df[(df['country'] == location) &
+              (df['date'] >= pd.Timestamp(from_date)) &
+              (df['date'] < pd.Timestamp(to_date) + pd.Timedelta(days=1))]
+    return rows.sort_values('date')[columns].reset_index(drop=True)
+
+@pytest.mark.parametrize('from_date, to_date', [('2020-01-05', '2020-01-10'),
+                                                ('2020-01-10', '2020-01-10'),
+                                                ('2020-01-01', '2020-01-30'),
+                                                ('2021-01-01', '2021-02-01')])
+def test_select(global_df, from_date, to_date):
+    index = covid19data.LocationIndex(global_df, 'country')
+    df = index.select('Country 2', from_date, to_date, columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected(global_df, 'Country 2', from_date, to_date))
+
+def test_select_whole_location(global_df):
+    index = covid19data.LocationIndex(global_df, 'country')
+    assert index.locations() == [f'Country {i}' for i in range(4)]
+    assert len(index.select('Country 1')) == 30
+    assert len(index.select('Unknown', '2020-01-01', '2020-01-30')) == 0
+    assert index.date_range('Country 1') == (pd.Timestamp('2020-01-01'), pd.Timestamp('2020-01-30'))
+
+@pytest.mark.parametrize('from_date, to_date', [('2020-01-05', '2020-01-10'),
+                                                ('2020-01-10', '2020-01-10'),
+                                                (None, None)])
+def test_query_matches_index(global_df, engine, from_date, to_date):
+    index = covid19data.LocationIndex(global_df, 'country')
+    query = covid19data.LocationQuery(engine, 'global', 'country')
+    assert query.locations() == index.locations()
+    assert query.date_range('Country 3') == index.date_range('Country 3')
+
+    pd.testing.assert_frame_equal(
+        query.select('Country 3', from_date, to_date, columns),
+        index.select('Country 3', from_date, to_date, columns).reset_index(drop=True),
+        check_dtype=False)
+
+def test_query_uses_index(engine):
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT date FROM global WHERE country = 'Country 1' "
+            "AND date >= '2020-01-05' AND date < '2020-01-10'").fetchall()
+    assert 'ix_global_country_date' in str(plan)
+
+def test_query_max_values(global_df, engine):
+    index = covid19data.LocationIndex(global_df, 'country')
+    query = covid19data.LocationQuery(engine, 'global', 'country')
+    columns = ['total_cases', 'population']
+    #Read from the summary table written with global table
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql('SELECT COUNT(*) FROM global_summary').scalar() == 4
+    pd.testing.assert_frame_equal(query.max_values(columns), index.max_values(columns),
+                                  check_dtype=False, check_index_type=False)
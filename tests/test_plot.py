@@ -0,0 +1,92 @@
+#Tests of the graphs of covid19plot on Agg canvases
+
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import covid19plot
+
+def agg_figure():
+    figure = Figure(figsize=(8, 6))
+    FigureCanvasAgg(figure)
+    return figure
+
+@pytest.fixture
+def panels():
+    figure = agg_figure()
+    return covid19plot.TimeSeriesPanels([figure.add_subplot(1, 2, i) for i in (1, 2)],
+                                        ['C0', 'C3'])
+
+def test_panels_update(panels):
+    dates = pd.date_range('2021-01-01', periods=30).values
+    panels.update(dates, [np.arange(30), np.arange(30) * 2])
+    panels.axes_list[0].get_figure().canvas.draw()
+
+    assert panels.lines[1].get_ydata()[-1] == 58
+    ymin, ymax = panels.axes_list[1].get_ylim()
+    assert ymin < 0 < 58 < ymax
+    assert panels.label(panels.axes_list[0], 3) == f'{3:n} | 04-Jan-21'
+
+def test_panels_compact_dtypes(panels):
+    #ymax - ymin of int8 values would wrap around
+    dates = pd.date_range('2021-01-01', periods=3).values
+    panels.update(dates, [np.array([-100, 0, 120], dtype='int8'),
+                          np.array([0, 30000, 32000], dtype='int16')])
+
+    ymin, ymax = panels.axes_list[0].get_ylim()
+    assert ymin == pytest.approx(-100 - 11) and ymax == pytest.approx(120 + 11)
+    ymin, ymax = panels.axes_list[1].get_ylim()
+    assert ymin == pytest.approx(-1600) and ymax == pytest.approx(33600)
+
+def test_panels_empty(panels):
+    dates = pd.date_range('2021-01-01', periods=30).values
+    panels.update(dates, [np.arange(30), np.arange(30)])
+    panels.update(dates[:0], [np.zeros(0), np.zeros(0)])
+    panels.axes_list[0].get_figure().canvas.draw()
+
+    assert len(panels.lines[0].get_xdata()) == 0
+    assert len(panels.fills[0].get_paths()) == 0
+    assert panels.nearest(panels.axes_list[0], 100, 100) is None
+
+def test_count_ticks():
+    ticks = covid19plot.count_ticks([34567, 7, 0, 100, 999])
+    assert ticks.shape == (5, 5)
+    assert ticks[:, -1].tolist() == [40000, 7, 0, 100, 1000]
+    assert ticks[0].tolist() == [0, 10000, 20000, 30000, 40000]
+    assert (ticks[:, 0] == 0).all()
+
+@pytest.mark.parametrize('kind', list(covid19plot.graph_layouts))
+def test_location_graph(kind):
+    figure = agg_figure()
+    panels = covid19plot.location_graph(figure, kind, covid19plot.plot_theme())
+    columns = covid19plot.graph_layouts[kind]['columns']
+
+    df = pd.DataFrame({'date': pd.date_range('2021-01-01', periods=60),
+                       **{column: np.arange(60) * (i + 1) for i, column in enumerate(columns)}})
+    covid19plot.update_graph(panels, kind, 'India', df)
+    figure.canvas.draw()
+    assert 'India' in figure.texts[0].get_text()
+    assert len(panels.lines[0].get_xdata()) == 60
+
+    #Location without rows in the selected dates
+    covid19plot.update_graph(panels, kind, 'Nowhere', df.iloc[:0])
+    figure.canvas.draw()
+    assert 'Nowhere' in figure.texts[0].get_text()
+    assert all(len(line.get_xdata()) == 0 for line in panels.lines)
+
+def test_hit_tester():
+    import shapely
+    from covid19bench import make_regions
+
+    names, geometries = make_regions(40, 50)
+    tester = covid19plot.HitTester('test', names, geometries)
+    rng = np.random.default_rng(0)
+    geometry_array = np.asarray(geometries, dtype=object)
+    #Points over the map and each one twice, to test the last hit too
+    points = np.repeat(rng.uniform([-185, -65], [-115, -15], (150, 2)), 2, axis=0)
+    for x, y in points:
+        inside = shapely.contains_xy(geometry_array, x, y)
+        assert tester.hit(x, y) == (names[inside.argmax()] if inside.any() else None)
+    assert covid19plot.hover_report['test']['events'] == 300
@@ -0,0 +1,65 @@
+#Tests of the headless reports of covid19report
+
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import covid19data
+import covid19report
+from covid19bench import make_global_data, make_states_daily
+
+@pytest.fixture(scope='module')
+def snapshot(tmp_path_factory):
+    #Feather snapshot of small synthetic tables, as written by the update
+    tmp_path = tmp_path_factory.mktemp('snapshot')
+    directory = str(tmp_path) + os.sep
+    engine = covid19data.sqlite_engine(os.path.join(tmp_path, 'test.db'))
+
+    records, state_dict = make_states_daily(4, 30)
+    india_daily = covid19data.reshape_states_daily(records, state_dict)
+    india_total = pd.DataFrame({'statecode': list(state_dict), 'state': list(state_dict.values()),
+                                'confirmed': 1000, 'active': 100, 'recovered': 800, 'deaths': 100,
+                                'population': 10**7, 'density': 300,
+                                'lastupdatedtime': pd.Timestamp('2021-01-01')})
+    global_df = make_global_data(3, 40)
+    covid19data.write_table(global_df, 'global', [engine])
+    covid19data.write_table(india_daily, 'india_daily', [engine])
+    covid19data.write_table(india_total, 'india_total', [engine])
+    assert covid19data.write_snapshot(engine, directory, datetime.now())
+    engine.dispose()
+    return directory, global_df, india_daily
+
+def test_report_tasks(snapshot):
+    directory, global_df, india_daily = snapshot
+    tasks = list(covid19report.report_tasks(directory))
+
+    countries = {location: rows for table, location, rows in tasks if table == 'global'}
+    states = {location: rows for table, location, rows in tasks if table == 'india_daily'}
+    assert sorted(countries) == sorted(global_df['country'].unique())
+    assert sorted(states) == sorted(set(india_daily['state']) - {'Total'})
+
+    table = covid19data.read_snapshot_table('global', directory, ['country', 'date']).to_pandas()
+    rows = table.iloc[countries['Country 1']]
+    assert (rows['country'] == 'Country 1').all()
+    assert rows['date'].is_monotonic_increasing and len(rows) == 40
+
+    tasks = list(covid19report.report_tasks(directory, '2020-01-05', '2020-01-14'))
+    countries = {location: rows for table, location, rows in tasks if table == 'global'}
+    dates = table['date'].iloc[countries['Country 1']]
+    assert len(dates) == 10 and dates.min() == pd.Timestamp('2020-01-05')
+
+def test_render_location(snapshot, tmp_path):
+    directory = snapshot[0]
+    covid19report.init_worker(directory)
+    for graph in covid19report.report_sources['global']['graphs']:
+        os.makedirs(tmp_path / graph)
+
+    task = next(task for task in covid19report.report_tasks(directory) if task[1] == 'Country 2')
+    paths, seconds = covid19report.render_location(task, str(tmp_path), ['png', 'svg'])
+    assert len(paths) == 4
+    assert all(os.path.getsize(path) > 0 for path in paths)
+    assert os.path.basename(paths[0]) == 'Country_2.png'
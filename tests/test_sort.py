@@ -0,0 +1,23 @@
+#Tests of the row order of the app's sorted table columns
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import covid19data
+
+@pytest.mark.parametrize('values', [
+    np.array([2.0, np.nan, 1.0, 3.0, np.nan]),
+    np.array(['2021-01-02', 'NaT', '2021-01-01', '2021-01-03', 'NaT'], dtype='datetime64[ns]'),
+    pd.array(['b', pd.NA, 'a', 'c', pd.NA], dtype='string').to_numpy(),
+    np.array(['b', None, 'a', 'c', np.nan], dtype=object)])
+@pytest.mark.parametrize('ascending', [True, False])
+def test_missing_values_last(values, ascending):
+    order = covid19data.sort_order(values, ascending)
+    expected = [2, 0, 3] if ascending else [3, 0, 2]
+    assert order.tolist() == expected + [1, 4]
+
+def test_stable():
+    values = np.array([1, 0, 1, 0])
+    assert covid19data.sort_order(values).tolist() == [1, 3, 0, 2]
+    assert covid19data.sort_order(values, ascending=False).tolist() == [0, 2, 1, 3]